@@ -3,12 +3,14 @@ import os
 from setuptools import setup
 
 readme = os.path.join(os.path.dirname(__file__), 'README.rst')
+with open(readme) as file_:
+    long_description = file_.read()
 
 setup(
     name='zimports',
     version="0.2.1",
     description="yet another import fixing tool",
-    long_description=open(readme).read(),
+    long_description=long_description,
     classifiers=[
         'Development Status :: 3 - Alpha',
         'License :: OSI Approved :: BSD License',
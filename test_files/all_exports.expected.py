@@ -0,0 +1,9 @@
+def f():
+    import os
+    return 1
+
+
+import os
+import sys
+
+__all__ = ["os", "sys"]
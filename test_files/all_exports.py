@@ -0,0 +1,9 @@
+def f():
+    import os
+    return 1
+
+
+import sys
+import os
+
+__all__ = ["os", "sys"]
@@ -0,0 +1,10 @@
+"""A module that has no imports.
+
+Nothing to import from here.
+"""
+
+x = 1
+
+
+def important():
+    return x
@@ -0,0 +1,3 @@
+import sys
+x = 1; import os
+print(sys, os, x)
@@ -0,0 +1,11 @@
+import bar
+import foo
+from hoho import bat3
+
+
+class Line8MovesToLine6:
+    pass
+
+foo
+bar
+bat3
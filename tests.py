@@ -90,6 +90,13 @@ class ImportsTest(unittest.TestCase):
     def test_whitespace2(self):
         self._assert_file("whitespace2.py")
 
+    def test_whitespace2_multi_imports(self):
+        self._assert_file(
+            "whitespace2.py",
+            opts=("--multi-imports", ),
+            checkfile="whitespace2.multi_imports.expected.py"
+        )
+
     def test_whitespace3(self):
         self._assert_file("whitespace3.py")
 
@@ -99,6 +106,39 @@ class ImportsTest(unittest.TestCase):
     def test_unicode_characters(self):
         self._assert_file("unicode_characters.py")
 
+    def test_semicolon_imports(self):
+        self._assert_file("semicolon_imports.py")
+
+    def test_all_exports(self):
+        self._assert_file("all_exports.py")
+
+    def test_no_imports(self):
+        self._assert_file("no_imports.py")
+
+    def test_multiple_files(self):
+        filenames = ["whitespace1.py", "whitespace2.py", "whitespace3.py"]
+        for jobs in ("1", "2"):
+            with self._capture_stdout() as buf:
+                zimports.main(
+                    ["test_files/%s" % filename for filename in filenames]
+                    + ["--stdout", "--jobs", jobs]
+                )
+
+            expected = ""
+            for filename in filenames:
+                checkfile = filename.replace(".py", ".expected.py")
+                with open("test_files/%s" % checkfile) as file_:
+                    expected += file_.read()
+            self.assertEqual(expected, buf.getvalue())
+
+    def test_jobs_must_be_positive(self):
+        for jobs in ("0", "-1"):
+            with contextlib.redirect_stderr(io.StringIO()):
+                with self.assertRaises(SystemExit):
+                    zimports.main(
+                        ["test_files/whitespace1.py", "--stdout", "-j", jobs]
+                    )
+
     def test_magic_encoding_comment(self):
         self._assert_file("cp1252.py", encoding="cp1252")
 
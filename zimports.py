@@ -5,8 +5,10 @@ import ast
 from ast import parse
 import codecs
 import collections
+import concurrent.futures
 import configparser
 import difflib
+import functools
 import importlib
 import os
 import re
@@ -19,6 +21,11 @@ import pyflakes.checker
 import pyflakes.messages
 
 
+# matches an "import" or "from" keyword at the start of a line; used to
+# skip files that can't have any toplevel imports
+_IMPORT_RE = re.compile(r"^[ \t]*(?:import|from)\b", re.M)
+
+
 def _rewrite_source(options, filename, source_lines):
 
     keep_threshhold = options.heuristic_unused
@@ -33,10 +40,27 @@ def _rewrite_source(options, filename, source_lines):
         "removed_imports": 0,
     }
 
+    source = "\n".join(source_lines)
+
+    # cheap check for files that have no imports at all, so that we can
+    # skip parsing them entirely
+    if not _IMPORT_RE.search(source):
+        stats.update(
+            {
+                "import_proportion": 0,
+                "import_line_delta": 0,
+                "added": 0,
+                "removed": 0,
+                "is_changed": False,
+                "totaltime": time.time() - stats["starttime"],
+            }
+        )
+        return list(source_lines), stats
+
     # parse the code.  get the imports and a collection of line numbers
     # we definitely don't want to discard
-    imports, _, lines_with_code = _parse_toplevel_imports(
-        options, filename, source_lines
+    imports, tree, lines_with_code = _parse_toplevel_imports(
+        options, filename, source_lines, source=source
     )
 
     original_imports = len(imports)
@@ -53,8 +77,7 @@ def _rewrite_source(options, filename, source_lines):
         filename, source_lines, imports, lines_with_code
     )
 
-    # flatten imports into single import per line and rewrite
-    # full source
+    # flatten imports into single import per line
     if not options.multi_imports:
         imports = list(
             _dedupe_single_imports(
@@ -63,20 +86,18 @@ def _rewrite_source(options, filename, source_lines):
             )
         )
 
-    on_source_lines = _write_source(
-        source_lines, imports, [], import_gap_lines, imports_start_on, style
-    )
-    # now parse again.  Because pyflakes won't tell us about unused
-    # imports that are not the first import, we had to flatten first.
-    imports, warnings, lines_with_code = _parse_toplevel_imports(
-        options, filename, on_source_lines, drill_for_warnings=True
+    # now run pyflakes against the flattened imports.  Because pyflakes
+    # won't tell us about unused imports that are not the first import,
+    # we had to flatten first.
+    imports, warnings, lines_of_code = _check_flattened_imports(
+        options, filename, source_lines, tree, imports, lines_with_code
     )
 
     # now remove unused names from the imports
     # if number of imports is greater than keep_threshold% of the total
     # lines of code, don't remove names, assume this is like a
     # package file
-    if not lines_with_code:
+    if not lines_of_code:
         stats["import_proportion"] = import_proportion = 0
     else:
         stats["import_proportion"] = import_proportion = (
@@ -85,7 +106,7 @@ def _rewrite_source(options, filename, source_lines):
                 + stats["star_imports_removed"]
                 - stats["names_from_star"]
             )
-            / float(len(lines_with_code))
+            / float(lines_of_code)
         ) * 100
 
     if keep_threshhold is None or import_proportion < keep_threshhold:
@@ -104,11 +125,21 @@ def _rewrite_source(options, filename, source_lines):
         style,
     )
 
-    differ = list(difflib.Differ().compare(source_lines, rewritten))
-
-    stats["added"] = len([l for l in differ if l.startswith("+ ")])
-    stats["removed"] = len([l for l in differ if l.startswith("- ")])
-    stats["is_changed"] = bool(stats["added"] or stats["removed"])
+    # only counts are needed here, so skip Differ's line-by-line
+    # comparison and just total up the opcodes
+    added = removed = 0
+    matcher = difflib.SequenceMatcher(
+        a=source_lines, b=rewritten, autojunk=False
+    )
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "delete"):
+            removed += i2 - i1
+        if tag in ("replace", "insert"):
+            added += j2 - j1
+
+    stats["added"] = added
+    stats["removed"] = removed
+    stats["is_changed"] = source_lines != rewritten
     stats["totaltime"] = time.time() - stats["starttime"]
     return rewritten, stats
 
@@ -118,12 +149,15 @@ def _get_import_discard_lines(
 ):
     """Get line numbers that are part of imports but not in the AST."""
 
-    import_gap_lines = {node.lineno for node in imports}
+    # imports are in line number order, so adding each import line
+    # followed by the gap lines after it keeps this list sorted
+    import_gap_lines = []
 
-    intermediary_whitespace_lines = []
+    linenos = [node.lineno for node in imports]
+    linenos.append(len(source_lines) + 1)
 
     prev = None
-    for lineno in [node.lineno for node in imports] + [len(source_lines) + 1]:
+    for lineno in linenos:
         if prev is not None:
             for gap in range(prev + 1, lineno):
                 if gap in lines_with_code:
@@ -131,34 +165,31 @@ def _get_import_discard_lines(
                     # are not in an import anymore, go to the next one
                     break
                 elif not _is_whitespace_or_comment(source_lines[gap - 1]):
-                    import_gap_lines.add(gap)
+                    import_gap_lines.append(gap)
+        if lineno != prev and lineno <= len(source_lines):
+            import_gap_lines.append(lineno)
         prev = lineno
 
     # now search for whitespace intermingled in the imports that does
-    # not include any non-import code
-    sorted_gap_lines = list(sorted(import_gap_lines))
-    for index, gap_line in enumerate(sorted_gap_lines[0:-1]):
-        for lineno in range(gap_line + 1, sorted_gap_lines[index + 1]):
-            if not source_lines[lineno - 1].rstrip():
-                intermediary_whitespace_lines.append(lineno)
-            else:
-                intermediary_whitespace_lines[:] = []
-        if intermediary_whitespace_lines:
-            import_gap_lines = import_gap_lines.union(
-                intermediary_whitespace_lines
-            )
-            intermediary_whitespace_lines[:] = []
+    # not include any non-import code.  that's the run of blank lines
+    # just before the next import line, so scan backwards from there and
+    # stop at the first line that isn't blank
+    whitespace_lines = []
+    for gap_line, next_line in zip(import_gap_lines, import_gap_lines[1:]):
+        for lineno in range(next_line - 1, gap_line, -1):
+            if source_lines[lineno - 1].rstrip():
+                break
+            whitespace_lines.append(lineno)
 
-    return import_gap_lines
+    # _write_source() only needs membership tests from here
+    return frozenset(import_gap_lines + whitespace_lines)
+
+
+_WS_COMMENT_RE = re.compile(r"""^\s*($|#|'''|\"\"\")""")
 
 
 def _is_whitespace_or_comment(line):
-    return bool(
-        re.match(r"^\s*$", line)
-        or re.match(r"^\s*#", line)
-        or re.match(r"^\s*'''", line)
-        or re.match(r'^\s*"""', line)
-    )
+    return _WS_COMMENT_RE.match(line) is not None
 
 
 def _write_source(
@@ -188,34 +219,26 @@ def _write_source(
                 buf.append(_write_import(import_node))
 
         if lineno not in import_gap_lines:
-            buf.append(line.rstrip())
+            # lines normally arrive stripped already; only allocate a
+            # new string for the ones that aren't
+            buf.append(line.rstrip() if line[-1:].isspace() else line)
     return buf
 
 
 def _write_import(import_node):
-    names = import_node.render_ast_names
-    modules = []
-    for name in names:
-        if name.asname:
-            modules.append("%s as %s" % (name.name, name.asname))
-        else:
-            modules.append(name.name)
-    modules.sort(key=lambda x: x.lower())
+    modules = [
+        f"{name.name} as {name.asname}" if name.asname else name.name
+        for name in import_node.render_ast_names
+    ]
+    modules.sort(key=str.lower)
     modules = ", ".join(modules)
+    noqa = "  # noqa" if import_node.noqa else ""
+    nosort = " nosort" if import_node.nosort else ""
     if not import_node.is_from:
-        return "import %s%s%s" % (
-            modules,
-            "  # noqa" if import_node.noqa else "",
-            " nosort" if import_node.nosort else "",
-        )
+        return f"import {modules}{noqa}{nosort}"
     else:
-        return "from %s%s import %s%s%s" % (
-            "." * import_node.level,
-            import_node.modules[0] or "",
-            modules,
-            "  # noqa" if import_node.noqa else "",
-            " nosort" if import_node.nosort else "",
-        )
+        module = "." * import_node.level + (import_node.modules[0] or "")
+        return f"from {module} import {modules}{noqa}{nosort}"
 
 
 class ClassifiedImport(
@@ -270,6 +293,17 @@ class ClassifiedImport(
             ]
 
 
+_NOQA_RE = re.compile(r".* # noqa( nosort)?")
+
+_classified_types = {}
+
+
+@functools.lru_cache(maxsize=None)
+def _root_package_name(name):
+    # flake8_import_order runs ast.parse() on the name each time
+    return f8io.root_package_name(name)
+
+
 class ImportVisitor(f8io.ImportVisitor):
     def __init__(
         self, source_lines, application_import_names, application_package_names
@@ -281,7 +315,7 @@ class ImportVisitor(f8io.ImportVisitor):
 
     def _get_flags(self, lineno):
         line = self.source_lines[lineno - 1].rstrip()
-        symbols = re.match(r".* # noqa( nosort)?", line)
+        symbols = _NOQA_RE.match(line)
         noqa = nosort = False
         if symbols:
             noqa = True
@@ -289,148 +323,278 @@ class ImportVisitor(f8io.ImportVisitor):
                 nosort = True
         return noqa, nosort
 
+    def _classify_type(self, module):
+        # the same modules tend to be imported over and over across the
+        # files in a run, so classify each one only once
+        key = (
+            module,
+            self.application_import_names,
+            self.application_package_names,
+        )
+        try:
+            return _classified_types[key]
+        except KeyError:
+            type_ = _classified_types[key] = super(
+                ImportVisitor, self
+            )._classify_type(module)
+            return type_
+
     def visit_Import(self, node):  # noqa: N802
-        if node.col_offset == 0:
-            modules = [alias.name for alias in node.names]
-            types_ = {self._classify_type(module) for module in modules}
-            if len(types_) == 1:
-                type_ = types_.pop()
-            else:
-                type_ = f8io.ImportType.MIXED
-            noqa, nosort = self._get_flags(node.lineno)
-            classified_import = ClassifiedImport(
-                type_,
-                False,
-                modules,
-                [],
-                node.lineno,
-                0,
-                f8io.root_package_name(modules[0]),
-                node.names,
-                list(node.names),
-                noqa,
-                nosort,
-            )
-            self.imports.append(classified_import)
+        modules = [alias.name for alias in node.names]
+        types_ = {self._classify_type(module) for module in modules}
+        if len(types_) == 1:
+            type_ = types_.pop()
+        else:
+            type_ = f8io.ImportType.MIXED
+        noqa, nosort = self._get_flags(node.lineno)
+        classified_import = ClassifiedImport(
+            type_,
+            False,
+            modules,
+            [],
+            node.lineno,
+            0,
+            _root_package_name(modules[0]),
+            node.names,
+            list(node.names),
+            noqa,
+            nosort,
+        )
+        self.imports.append(classified_import)
 
     def visit_ImportFrom(self, node):  # noqa: N802
-        if node.col_offset == 0:
-            module = node.module or ""
-            if node.level > 0:
-                type_ = f8io.ImportType.APPLICATION_RELATIVE
-            else:
-                type_ = self._classify_type(module)
-            names = [alias.name for alias in node.names]
-            noqa, nosort = self._get_flags(node.lineno)
-            classified_import = ClassifiedImport(
-                type_,
-                True,
-                [module],
-                names,
-                node.lineno,
-                node.level,
-                f8io.root_package_name(module),
-                node.names,
-                list(node.names),
-                noqa,
-                nosort,
-            )
-            self.imports.append(classified_import)
+        module = node.module or ""
+        if node.level > 0:
+            type_ = f8io.ImportType.APPLICATION_RELATIVE
+        else:
+            type_ = self._classify_type(module)
+        names = [alias.name for alias in node.names]
+        noqa, nosort = self._get_flags(node.lineno)
+        classified_import = ClassifiedImport(
+            type_,
+            True,
+            [module],
+            names,
+            node.lineno,
+            node.level,
+            _root_package_name(module),
+            node.names,
+            list(node.names),
+            noqa,
+            nosort,
+        )
+        self.imports.append(classified_import)
 
 
-def _parse_toplevel_imports(
-    options, filename, source_lines, drill_for_warnings=False
-):
-    source = "\n".join(source_lines)
+@functools.lru_cache(maxsize=None)
+def _split_names(names):
+    # split a comma separated option once per run rather than for each
+    # parse, skipping the empty name an unset option splits into
+    return frozenset(name for name in names.split(",") if name)
+
+
+def _parse_toplevel_imports(options, filename, source_lines, source=None):
+    if source is None:
+        source = "\n".join(source_lines)
 
     tree = ast.parse(source, filename)
 
+    f8io_visitor = ImportVisitor(
+        source_lines,
+        _split_names(options.application_import_names),
+        _split_names(options.application_package_names),
+    )
+
+    # alias nodes have line numbers as of Python 3.10, but they're part of
+    # the import they belong to rather than code
     lines_with_code = set(
-        node.lineno for node in ast.walk(tree) if hasattr(node, "lineno")
+        node.lineno
+        for node in ast.walk(tree)
+        if hasattr(node, "lineno") and not isinstance(node, ast.alias)
     )
 
-    warnings = pyflakes.checker.Checker(tree, filename)
+    # toplevel imports are direct children of the module, so there's no
+    # need to have the visitor descend into the rest of the tree.  imports
+    # that follow other statements on the same line, e.g. after a
+    # semicolon, are left where they are
+    for node in tree.body:
+        if (
+            isinstance(node, (ast.Import, ast.ImportFrom))
+            and node.col_offset == 0
+        ):
+            f8io_visitor.visit(node)
+    imports = f8io_visitor.imports
+    return imports, tree, lines_with_code
 
-    if drill_for_warnings:
-        warnings_set = _drill_for_warnings(filename, source_lines, warnings)
-    else:
-        warnings_set = None
+
+def _check_flattened_imports(
+    options, filename, source_lines, tree, imports, lines_with_code
+):
+    """Run pyflakes against the module with its toplevel imports replaced
+    by the given flattened ones.
+
+    Rather than writing out and re-parsing the whole file, only the
+    flattened import lines are parsed, and their nodes are spliced into
+    the existing tree in place of the original toplevel imports.
+
+    """
+
+    import_source_lines = [_write_import(node) for node in imports]
+    import_tree = ast.parse("\n".join(import_source_lines), filename)
 
     f8io_visitor = ImportVisitor(
-        source_lines,
-        options.application_import_names.split(","),
-        options.application_package_names.split(","),
+        import_source_lines,
+        _split_names(options.application_import_names),
+        _split_names(options.application_package_names),
     )
-    f8io_visitor.visit(tree)
-    imports = f8io_visitor.imports
-    return imports, warnings_set, lines_with_code
+    for node in import_tree.body:
+        f8io_visitor.visit(node)
+
+    # the line numbers of the flattened imports are those of
+    # import_source_lines, which would collide with those of the original
+    # nodes they're spliced in among, so move them past the end of the
+    # file while pyflakes runs, and move the warnings back afterwards
+    offset = len(source_lines)
+    for node in import_tree.body:
+        ast.increment_lineno(node, offset)
+
+    # the flattened imports go where the first toplevel import was, and
+    # the rest of the toplevel imports are removed, the same way
+    # _write_source() lays them out
+    body = []
+    original_import_lines = set()
+    for node in tree.body:
+        if (
+            isinstance(node, (ast.Import, ast.ImportFrom))
+            and node.col_offset == 0
+        ):
+            if not original_import_lines:
+                body.extend(import_tree.body)
+            original_import_lines.update(
+                range(node.lineno, node.end_lineno + 1)
+            )
+        else:
+            body.append(node)
+
+    warnings = _ModuleBindingChecker(
+        ast.Module(body=body, type_ignores=[]), filename
+    )
+    warnings_set = {
+        (name, lineno - offset)
+        for name, lineno in _drill_for_warnings(
+            warnings, set(import_tree.body)
+        )
+    }
+
+    # count lines of code as though the flattened imports were written
+    # out, one per line
+    lines_of_code = len(lines_with_code - original_import_lines) + len(
+        import_source_lines
+    )
+    return f8io_visitor.imports, warnings_set, lines_of_code
+
+
+class _ModuleBindingChecker(pyflakes.checker.Checker):
+    """pyflakes Checker that also keeps track of every binding made in
+    the module scope, including those that were later shadowed by a
+    rebinding of the same name."""
+
+    def __init__(self, *arg, **kw):
+        self.module_bindings = collections.defaultdict(list)
+        super(_ModuleBindingChecker, self).__init__(*arg, **kw)
+
+    def addBinding(self, node, value):  # noqa: N802
+        super(_ModuleBindingChecker, self).addBinding(node, value)
+        if self.scopeStack[0].get(value.name) is value and not isinstance(
+            value, pyflakes.checker.Builtin
+        ):
+            self.module_bindings[value.name].append(value)
+
 
+def _unused_import_name(binding):
+    # the name pyflakes puts in an UnusedImport message for a binding;
+    # newer pyflakes spells this imported_name rather than str()
+    return getattr(binding, "imported_name", None) or str(binding)
 
-def _drill_for_warnings(filename, source_lines, warnings):
+
+def _drill_for_warnings(warnings, toplevel_imports):
     # pyflakes doesn't warn for all occurrences of an unused import
-    # if that same symbol is repeated, so run over and over again
-    # until we find every possible warning.  assumes single-line
-    # imports
+    # if that same symbol is repeated, as it only reports on the last
+    # binding of a name.  so for each name that's reported, walk back
+    # through the bindings it shadowed to find every possible warning.
+    # assumes single-line imports
+
+    reported = {
+        (warning.message_args[0], warning.lineno)
+        for warning in warnings.messages
+        if isinstance(warning, pyflakes.messages.UnusedImport)
+    }
+
+    # the usual case where every import is used; if none of the final
+    # bindings are unused, there's nothing shadowed to look at either
+    if not reported:
+        return set()
 
-    source_lines = list(source_lines)
     warnings_set = set()
-    seen_lineno = set()
-    while True:
-        has_warnings = False
-        for warning in warnings.messages:
+    for bindings in warnings.module_bindings.values():
+        for index, binding in enumerate(reversed(bindings)):
+            # a rebinding inherits the "used" flag of what it replaces,
+            # so once we hit a used import, everything it shadows
+            # was in use as well
             if (
-                not isinstance(warning, pyflakes.messages.UnusedImport)
-                or warning.lineno in seen_lineno
+                not isinstance(binding, pyflakes.checker.Importation)
+                or binding.used
             ):
-                continue
+                break
+            key = (_unused_import_name(binding), binding.source.lineno)
+
+            # the final binding has to be one that pyflakes reported,
+            # which takes care of __all__ and similar
+            if index == 0 and key not in reported:
+                break
 
             # we only deal with "top level" imports for now. imports
-            # inside of conditionals or in defs aren't counted.
-            whitespace = re.match(
-                r"^\s*", source_lines[warning.lineno - 1]
-            ).group(0)
-            if whitespace:
-                continue
-            has_warnings = True
-            warnings_set.add((warning.message_args[0], warning.lineno))
+            # inside of conditionals or in defs aren't counted, nor
+            # is anything those imports shadow
+            if binding.source not in toplevel_imports:
+                break
+            warnings_set.add(key)
 
-            # replace the line with nothing so that we approach no more
-            # warnings generated. note this would be much trickier if we are
-            # trying to deal with imports inside conditionals/defs
-            source_lines[warning.lineno - 1] = ""
-            seen_lineno.add(warning.lineno)
+    return warnings_set
 
-        if not has_warnings:
-            break
 
-        source = "\n".join(source_lines)
-        tree = ast.parse(source, filename)
-        warnings = pyflakes.checker.Checker(tree, filename)
+def _remove_unused_names(imports, warnings, stats):
+    removed_import_count = 0
 
-    return warnings_set
+    # nothing is unused in the common case, so skip generating keys for
+    # every import
+    if warnings:
+        noqa_lines = set(
+            import_node.lineno for import_node in imports if import_node.noqa
+        )
 
+        remove_imports = {
+            (name, lineno)
+            for name, lineno in warnings
+            if lineno not in noqa_lines
+        }
+        remove_lines = {lineno for name, lineno in remove_imports}
 
-def _remove_unused_names(imports, warnings, stats):
-    noqa_lines = set(
-        import_node.lineno for import_node in imports if import_node.noqa
-    )
+        for import_node in imports:
+            if import_node.lineno not in remove_lines:
+                continue
 
-    remove_imports = {
-        (name, lineno) for name, lineno in warnings if lineno not in noqa_lines
-    }
+            # generate a key that matches the key we get from
+            # pyflakes to match up
+            new = [
+                ast_name
+                for warning_key, ast_name in import_node.pyflakes_warning_keys
+                if (warning_key, import_node.lineno) not in remove_imports
+            ]
+            removed_import_count += len(import_node.ast_names) - len(new)
+            import_node.render_ast_names[:] = new
 
-    removed_import_count = 0
-    for import_node in imports:
-        # generate a key that matches the key we get from
-        # pyflakes to match up
-        new = [
-            ast_name
-            for warning_key, ast_name in import_node.pyflakes_warning_keys
-            if (warning_key, import_node.lineno) not in remove_imports
-        ]
-        removed_import_count += len(import_node.ast_names) - len(new)
-        import_node.render_ast_names[:] = new
-    new_imports = [node for node in imports if node.render_ast_names]
+        imports[:] = [node for node in imports if node.render_ast_names]
 
     stats["removed_imports"] += (
         removed_import_count
@@ -438,13 +602,10 @@ def _remove_unused_names(imports, warnings, stats):
         + stats["star_imports_removed"]
     )
 
-    imports[:] = new_imports
-
 
 def _dedupe_single_imports(import_nodes, stats):
 
     seen = {}
-    orig_order = []
 
     for import_node in import_nodes:
         if not import_node.is_from:
@@ -462,19 +623,19 @@ def _dedupe_single_imports(import_nodes, stats):
                 import_node.ast_names[0].asname,
             )
 
-        orig_order.append((import_node, hash_key))
-
-        if hash_key in seen:
-            if import_node.noqa and not seen[hash_key].noqa:
-                seen[hash_key] = import_node
-        else:
+        existing = seen.get(hash_key)
+        if existing is None:
             seen[hash_key] = import_node
-
-    for import_node, hash_key in orig_order:
-        if seen[hash_key] is import_node:
-            yield import_node
         else:
             stats["removed_imports"] += 1
+            if import_node.noqa and not existing.noqa:
+                # re-insert so that the dict stays in the order of the
+                # imports that are kept
+                del seen[hash_key]
+                seen[hash_key] = import_node
+
+    for import_node in seen.values():
+        yield import_node
 
 
 def _as_single_imports(import_nodes, stats, expand_stars=False):
@@ -544,7 +705,7 @@ def sort_imports(style, imports, options):
         else:
             tosort.append(import_node)
 
-    sorted_ = sorted(tosort, key=lambda n: style.import_key(n))
+    sorted_ = sorted(tosort, key=style.import_key)
     return sorted_, nosort
 
 
@@ -617,7 +778,7 @@ def _parse_magic_encoding_comment(fp):
         fp.seek(pos)
 
 
-def _run_file(options, filename):
+def _rewrite_file(options, filename):
 
     lines, encoding_comment = _read_python_source(filename)
     source_lines = [line.rstrip() for line in lines]
@@ -629,6 +790,15 @@ def _run_file(options, filename):
             )
         options.heuristic_unused = 0
     result, stats = _rewrite_source(options, filename, source_lines)
+    return source_lines, encoding_comment, result, stats
+
+
+def _run_file(options, filename, rewritten=None):
+
+    if rewritten is None:
+        rewritten = _rewrite_file(options, filename)
+    source_lines, encoding_comment, result, stats = rewritten
+
     totaltime = stats["totaltime"]
     if not stats["is_changed"]:
         sys.stderr.write(
@@ -675,6 +845,18 @@ def _run_file(options, filename):
                     file_.writelines(_lines_with_newlines(result))
 
 
+def _positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            "%r is not a positive integer" % value
+        )
+    return number
+
+
 def main(argv=None):
     parser = argparse.ArgumentParser()
 
@@ -749,21 +931,47 @@ def main(argv=None):
     parser.add_argument(
         "--stdout", action="store_true", help="dump file output to stdout"
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=_positive_int,
+        help="number of processes used to rewrite files when more than one "
+        "file is given; defaults to the number of CPUs.  Use 1 to rewrite "
+        "files one at a time in this process",
+    )
     parser.add_argument(
         "filename", nargs="+", help="Python filename(s) or directories"
     )
 
     options = parser.parse_args(argv)
 
+    filenames = []
     for filename in options.filename:
         if os.path.isdir(filename):
             for root, dirs, files in os.walk(filename):
                 for file in files:
                     if file.endswith(".py"):
-                        _run_file(options, os.path.join(root, file))
+                        filenames.append(os.path.join(root, file))
 
         else:
+            filenames.append(filename)
+
+    if options.jobs == 1 or len(filenames) < 2:
+        for filename in filenames:
             _run_file(options, filename)
+    else:
+        # files are rewritten independently of each other, so farm that
+        # out to worker processes.  results come back in order and are
+        # reported and written from here
+        jobs = options.jobs or os.cpu_count() or 1
+        with concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+            rewrites = pool.map(
+                functools.partial(_rewrite_file, options),
+                filenames,
+                chunksize=max(1, len(filenames) // (jobs * 4)),
+            )
+            for filename, rewritten in zip(filenames, rewrites):
+                _run_file(options, filename, rewritten)
 
 
 if __name__ == "__main__":